@@ -3,12 +3,14 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from flask_migrate import Migrate
 from config import Config
+from app.profiler import Profiler
 
 db = SQLAlchemy()
 migrate = Migrate()
 login_manager = LoginManager()
 login_manager.login_view = 'auth.login'
 login_manager.login_message_category = 'info'
+profiler = Profiler()
 
 def create_app(config_class=Config):
     app = Flask(__name__, static_folder='../static')
@@ -17,6 +19,7 @@ def create_app(config_class=Config):
     db.init_app(app)
     migrate.init_app(app, db)
     login_manager.init_app(app)
+    profiler.init_app(app)
     
     from app.routes import main, auth, products, cart, orders, admin
     app.register_blueprint(main)
@@ -26,8 +29,15 @@ def create_app(config_class=Config):
     app.register_blueprint(orders)
     app.register_blueprint(admin)
     
+    from app.retention import retention_cli
+    app.cli.add_command(retention_cli)
+    from app.feeds import feeds_cli
+    app.cli.add_command(feeds_cli)
+    
     with app.app_context():
         db.create_all()
+        from app.retention import ensure_indexes
+        ensure_indexes()
         
         # Auto-seed database if empty
         from app.models import Product, Category, User
@@ -0,0 +1,260 @@
+import csv
+import gzip
+import json
+import os
+import re
+import shutil
+import click
+from datetime import datetime
+from xml.sax.saxutils import escape
+from flask import current_app, url_for
+from flask.cli import AppGroup
+from app import db
+from app.models import Product
+
+feeds_cli = AppGroup('feeds', help='Generate the sitemap and product feeds.')
+
+# Sitemap protocol limit per file; shards are id ranges so they never exceed it
+SITEMAP_MAX_URLS = 50000
+
+# Bump when the shard contents change so existing shards are rebuilt
+FEED_FORMAT_VERSION = 1
+
+SITEMAP_NS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+CSV_FIELDS = ['id', 'title', 'description', 'link', 'image_link', 'price', 'sale_price', 'availability', 'stock_quantity']
+# Not a Google Merchant attribute, so kept out of the XML feed
+CSV_ONLY_FIELDS = {'stock_quantity'}
+SHARD_FILE_RE = re.compile(r'^(?:sitemap-products|products)-(\d+)\.(?:xml|csv)\.gz$')
+
+FEED_COLUMNS = [Product.id, Product.name, Product.description, Product.price, Product.discounted_price,
+                Product.stock_quantity, Product.image_url, Product.updated_at]
+
+def feeds_dir():
+    return os.path.join(current_app.instance_path, 'feeds')
+
+def stream_products(*criteria):
+    """Yield active product rows in id order, fetched in FEED_CHUNK_SIZE chunks
+    through a server-side cursor where the database supports one"""
+    stmt = (
+        db.select(*FEED_COLUMNS)
+        .where(Product.is_active == True, *criteria)
+        .order_by(Product.id)
+        .execution_options(stream_results=True, yield_per=current_app.config['FEED_CHUNK_SIZE'])
+    )
+    return db.session.execute(stmt)
+
+def product_entry(row):
+    """Feed fields for one product row. `sale_price` is only set when the
+    product is discounted, so the final price is sale_price or else price."""
+    image_url = row.image_url or 'images/placeholder.svg'
+    if not image_url.startswith(('http://', 'https://')):
+        image_url = url_for('static', filename=image_url, _external=True)
+    return {
+        'id': row.id,
+        'title': row.name,
+        'description': row.description or '',
+        'link': url_for('main.product_detail', product_id=row.id, _external=True),
+        'image_link': image_url,
+        'price': f'{row.price:.2f} USD',
+        'sale_price': f'{row.discounted_price:.2f} USD' if row.discounted_price else '',
+        'availability': 'in stock' if (row.stock_quantity or 0) > 0 else 'out of stock',
+        'stock_quantity': row.stock_quantity or 0,
+    }
+
+def w3c_date(value):
+    return (value or datetime.utcnow()).strftime('%Y-%m-%dT%H:%M:%S+00:00')
+
+class ShardWriter:
+    """Writes the sitemap and feed parts for one id range of products"""
+
+    def __init__(self, directory, shard):
+        self.paths = dict(zip(('sitemap', 'xml', 'csv'), shard_paths(directory, shard)))
+        self.files = {key: gzip.open(f'{path}.tmp', 'wt', encoding='utf-8', newline='')
+                      for key, path in self.paths.items()}
+        self.csv = csv.DictWriter(self.files['csv'], fieldnames=CSV_FIELDS)
+        self.files['sitemap'].write(f'<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="{SITEMAP_NS}">\n')
+
+    def write(self, row):
+        entry = product_entry(row)
+        self.files['sitemap'].write(
+            f'<url><loc>{escape(entry["link"])}</loc><lastmod>{w3c_date(row.updated_at)}</lastmod></url>\n'
+        )
+        self.files['xml'].write(
+            '<item>' + ''.join(f'<g:{key}>{escape(str(value))}</g:{key}>' for key, value in entry.items()
+                               if value != '' and key not in CSV_ONLY_FIELDS) + '</item>\n'
+        )
+        self.csv.writerow(entry)
+
+    def close(self):
+        self.files['sitemap'].write('</urlset>\n')
+        for key, f in self.files.items():
+            f.close()
+            os.replace(f'{self.paths[key]}.tmp', self.paths[key])
+
+def shard_paths(directory, shard):
+    return [os.path.join(directory, f'sitemap-products-{shard}.xml.gz'),
+            os.path.join(directory, 'parts', f'products-{shard}.xml.gz'),
+            os.path.join(directory, 'parts', f'products-{shard}.csv.gz')]
+
+def remove_shard(directory, shard):
+    for path in shard_paths(directory, shard):
+        if os.path.exists(path):
+            os.remove(path)
+
+def shard_complete(directory, shard):
+    return all(os.path.exists(path) for path in shard_paths(directory, shard))
+
+def remove_tmp_files(directory):
+    """Delete .tmp leftovers from an interrupted run"""
+    for folder in (directory, os.path.join(directory, 'parts')):
+        for name in os.listdir(folder):
+            if name.endswith('.tmp'):
+                os.remove(os.path.join(folder, name))
+
+def existing_shards(directory):
+    shards = set()
+    for name in os.listdir(directory) + os.listdir(os.path.join(directory, 'parts')):
+        match = SHARD_FILE_RE.match(name)
+        if match:
+            shards.add(int(match.group(1)))
+    return shards
+
+def write_shards(directory, shard_size, shards=None):
+    """Regenerate the given shards (all of them when `shards` is None) in a
+    single streaming pass. Returns the shards that ended up with products."""
+    criteria = []
+    if shards is not None:
+        if not shards:
+            return set()
+        criteria.append(db.or_(*[Product.id.between(s * shard_size, (s + 1) * shard_size - 1) for s in shards]))
+
+    written = set()
+    writer = None
+    for row in stream_products(*criteria):
+        shard = row.id // shard_size
+        if shard not in written:
+            if writer:
+                writer.close()
+            writer = ShardWriter(directory, shard)
+            written.add(shard)
+        writer.write(row)
+    if writer:
+        writer.close()
+    return written
+
+def concat_parts(path, head, parts, tail):
+    """Build one gzip file from gzip members without recompressing the parts"""
+    with open(f'{path}.tmp', 'wb') as out:
+        if head:
+            out.write(gzip.compress(head.encode('utf-8')))
+        for part in parts:
+            with open(part, 'rb') as f:
+                shutil.copyfileobj(f, out)
+        if tail:
+            out.write(gzip.compress(tail.encode('utf-8')))
+    os.replace(f'{path}.tmp', path)
+
+def write_feeds(directory, shards):
+    parts_dir = os.path.join(directory, 'parts')
+    ordered = sorted(shards)
+
+    csv_header = ','.join(CSV_FIELDS) + '\r\n'
+    concat_parts(os.path.join(directory, 'products.csv.gz'), csv_header,
+                 [os.path.join(parts_dir, f'products-{s}.csv.gz') for s in ordered], None)
+
+    xml_head = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<rss version="2.0" xmlns:g="http://base.google.com/ns/1.0">\n<channel>\n'
+                '<title>T-Shirt Store</title>\n'
+                f'<link>{escape(url_for("main.index", _external=True))}</link>\n'
+                '<description>T-Shirt Store product feed</description>\n')
+    concat_parts(os.path.join(directory, 'products.xml.gz'), xml_head,
+                 [os.path.join(parts_dir, f'products-{s}.xml.gz') for s in ordered], '</channel>\n</rss>\n')
+
+def write_sitemaps(directory, shards):
+    pages_path = os.path.join(directory, 'sitemap-pages.xml.gz')
+    with gzip.open(f'{pages_path}.tmp', 'wt', encoding='utf-8') as f:
+        f.write(f'<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="{SITEMAP_NS}">\n')
+        for endpoint in ('main.index', 'main.products_list'):
+            f.write(f'<url><loc>{escape(url_for(endpoint, _external=True))}</loc></url>\n')
+        f.write('</urlset>\n')
+    os.replace(f'{pages_path}.tmp', pages_path)
+
+    names = ['sitemap-pages.xml.gz'] + [f'sitemap-products-{s}.xml.gz' for s in sorted(shards)]
+    index_path = os.path.join(directory, 'sitemap.xml')
+    with open(f'{index_path}.tmp', 'w', encoding='utf-8') as f:
+        f.write(f'<?xml version="1.0" encoding="UTF-8"?>\n<sitemapindex xmlns="{SITEMAP_NS}">\n')
+        for name in names:
+            lastmod = datetime.utcfromtimestamp(os.path.getmtime(os.path.join(directory, name)))
+            loc = url_for('main.sitemap_file', filename=name, _external=True)
+            f.write(f'<sitemap><loc>{escape(loc)}</loc><lastmod>{w3c_date(lastmod)}</lastmod></sitemap>\n')
+        f.write('</sitemapindex>\n')
+    os.replace(f'{index_path}.tmp', index_path)
+
+def generate_feeds(full=False):
+    """Regenerate the sitemap and product feeds under instance/feeds/.
+
+    Products are split into id-range shards. Unless `full` is set, only the
+    shards containing a product whose `updated_at` changed since the last run
+    are rewritten; the feeds are then reassembled from the shard files.
+    Returns the list of regenerated shards.
+    """
+    directory = feeds_dir()
+    os.makedirs(os.path.join(directory, 'parts'), exist_ok=True)
+    remove_tmp_files(directory)
+    shard_size = min(current_app.config['FEED_SHARD_SIZE'], SITEMAP_MAX_URLS)
+    state_path = os.path.join(directory, 'state.json')
+
+    # An unreadable state file (e.g. a run killed mid-write) means a full rebuild
+    since = None
+    if not full:
+        try:
+            with open(state_path) as f:
+                state = json.load(f)
+            if state.get('shard_size') == shard_size and state.get('version') == FEED_FORMAT_VERSION:
+                since = datetime.fromisoformat(state['last_run'])
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            since = None
+
+    # Taken before reading so updates made during the run are picked up next time
+    started_at = datetime.utcnow()
+
+    with current_app.test_request_context(base_url=current_app.config['FEED_BASE_URL']):
+        previous = existing_shards(directory)
+        if since is not None:
+            changed = db.session.execute(
+                db.select(Product.id)
+                .where(Product.updated_at > since)
+                .execution_options(stream_results=True, yield_per=current_app.config['FEED_CHUNK_SIZE'])
+            ).scalars()
+            dirty = {product_id // shard_size for product_id in changed}
+            # Reassembling needs every kept shard's files; if any went missing, rebuild everything
+            if not all(shard_complete(directory, shard) for shard in previous - dirty):
+                since = None
+        if since is not None:
+            written = write_shards(directory, shard_size, dirty)
+            shards = (previous - dirty) | written
+        else:
+            dirty = previous
+            written = write_shards(directory, shard_size)
+            dirty |= written
+            shards = written
+
+        for shard in dirty - written:
+            remove_shard(directory, shard)
+
+        write_feeds(directory, shards)
+        write_sitemaps(directory, shards)
+
+    with open(f'{state_path}.tmp', 'w') as f:
+        json.dump({'last_run': started_at.isoformat(), 'shard_size': shard_size,
+                   'version': FEED_FORMAT_VERSION}, f)
+    os.replace(f'{state_path}.tmp', state_path)
+
+    return sorted(dirty)
+
+@feeds_cli.command('generate')
+@click.option('--full', is_flag=True, help='Rebuild every shard instead of only changed ones.')
+def generate_command(full):
+    """Write sitemap.xml, products.xml.gz and products.csv.gz."""
+    shards = generate_feeds(full)
+    click.echo(f'Regenerated {len(shards)} shard(s) in {feeds_dir()}.')
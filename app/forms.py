@@ -1,6 +1,7 @@
 from flask_wtf import FlaskForm
-from wtforms import StringField, PasswordField, TextAreaField, DecimalField, IntegerField, SelectField, BooleanField
-from wtforms.validators import DataRequired, Email, Length, EqualTo, NumberRange, ValidationError
+from flask import current_app
+from wtforms import StringField, PasswordField, TextAreaField, DecimalField, IntegerField, SelectField, BooleanField, FloatField
+from wtforms.validators import DataRequired, Email, Length, EqualTo, NumberRange, Optional, ValidationError
 from app.models import User
 
 class RegistrationForm(FlaskForm):
@@ -42,4 +43,13 @@ class ReviewForm(FlaskForm):
 class CheckoutForm(FlaskForm):
     shipping_address = TextAreaField('Shipping Address', validators=[DataRequired()])
     billing_address = TextAreaField('Billing Address', validators=[DataRequired()])
-    payment_method = SelectField('Payment Method', choices=[('credit_card', 'Credit Card'), ('paypal', 'PayPal')])
\ No newline at end of file
+    payment_method = SelectField('Payment Method', choices=[('credit_card', 'Credit Card'), ('paypal', 'PayPal')])
+
+class ProfilerForm(FlaskForm):
+    enabled = BooleanField('Enabled')
+    sample_rate = FloatField('Sample Rate', default=0.01, validators=[NumberRange(min=0, max=1)])
+    endpoint = StringField('Endpoint', validators=[Optional(), Length(max=100)])
+    
+    def validate_endpoint(self, endpoint):
+        if endpoint.data not in current_app.view_functions:
+            raise ValidationError('Unknown endpoint, e.g. orders.checkout or main.products_list.')
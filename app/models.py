@@ -80,7 +80,7 @@ class CartItem(db.Model):
     
     id = db.Column(db.Integer, primary_key=True)
     quantity = db.Column(db.Integer, default=1)
-    added_at = db.Column(db.DateTime, default=datetime.utcnow)
+    added_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
     product_id = db.Column(db.Integer, db.ForeignKey('products.id'))
@@ -91,6 +91,8 @@ class CartItem(db.Model):
 
 class Order(db.Model):
     __tablename__ = 'orders'
+    # Never reuse ids on SQLite, archived orders keep theirs
+    __table_args__ = {'sqlite_autoincrement': True}
     
     id = db.Column(db.Integer, primary_key=True)
     order_number = db.Column(db.String(50), unique=True)
@@ -100,7 +102,7 @@ class Order(db.Model):
     billing_address = db.Column(db.Text)
     payment_method = db.Column(db.String(50))
     payment_status = db.Column(db.String(20), default='pending')
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
@@ -116,6 +118,7 @@ class Order(db.Model):
 
 class OrderItem(db.Model):
     __tablename__ = 'order_items'
+    __table_args__ = {'sqlite_autoincrement': True}
     
     id = db.Column(db.Integer, primary_key=True)
     quantity = db.Column(db.Integer)
@@ -128,6 +131,43 @@ class OrderItem(db.Model):
     def total_price(self):
         return self.quantity * self.price
 
+class ArchivedOrder(db.Model):
+    """Order moved out of the hot `orders` table by the retention job."""
+    __tablename__ = 'archived_orders'
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    order_number = db.Column(db.String(50), unique=True)
+    total_amount = db.Column(db.Numeric(10, 2))
+    status = db.Column(db.String(20))
+    shipping_address = db.Column(db.Text)
+    billing_address = db.Column(db.Text)
+    payment_method = db.Column(db.String(50))
+    payment_status = db.Column(db.String(20))
+    created_at = db.Column(db.DateTime, index=True)
+    updated_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), index=True)
+    
+    user = db.relationship('User')
+    order_items = db.relationship('ArchivedOrderItem', backref='order', lazy='dynamic')
+
+class ArchivedOrderItem(db.Model):
+    __tablename__ = 'archived_order_items'
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    quantity = db.Column(db.Integer)
+    price = db.Column(db.Numeric(10, 2))
+    
+    order_id = db.Column(db.Integer, db.ForeignKey('archived_orders.id'), index=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'))
+    
+    product = db.relationship('Product')
+    
+    @property
+    def total_price(self):
+        return self.quantity * self.price
+
 class Review(db.Model):
     __tablename__ = 'reviews'
     
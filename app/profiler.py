@@ -0,0 +1,190 @@
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+from flask import current_app, g, request
+
+PROFILE_NAME_RE = re.compile(r'^(\d{8}-\d{6})_([\w.]+)_(\d+)ms_[0-9a-f]+\.collapsed$')
+
+class StackSampler:
+    """Samples one thread's Python stack from a background thread"""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self.started_at
+        return self.stacks
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                break
+            stack = []
+            while frame is not None:
+                stack.append(frame_label(frame))
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+
+def frame_label(frame):
+    code = frame.f_code
+    filename = '/'.join(code.co_filename.replace('\\', '/').split('/')[-2:])
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(';', ':')
+
+class Profiler:
+    """Per-request sampling profiler switched on from the admin panel.
+
+    Settings live in `instance/profiler.json` so every worker picks them up;
+    the file is re-checked at most every PROFILER_RELOAD_SECONDS. Profiles
+    are written to `instance/profiles/` as collapsed stacks, ready for
+    flamegraph.pl or speedscope.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.sample_rate = 0.0
+        self.endpoint = None
+        self._settings_key = None
+        self._next_check = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.interval = app.config['PROFILER_INTERVAL']
+        self.max_profiles = app.config['PROFILER_MAX_PROFILES']
+        self.reload_seconds = app.config['PROFILER_RELOAD_SECONDS']
+        self._settings_key = None
+        self._next_check = 0
+        with app.app_context():
+            self.reload()
+
+        app.extensions['profiler'] = self
+        app.before_request(self._before_request)
+        app.teardown_request(self._teardown_request)
+
+    # Resolved on use so a changed app.instance_path is honoured
+    @property
+    def settings_path(self):
+        return os.path.join(current_app.instance_path, 'profiler.json')
+
+    @property
+    def profiles_dir(self):
+        return os.path.join(current_app.instance_path, 'profiles')
+
+    def reload(self):
+        settings_path = self.settings_path
+        try:
+            mtime = os.stat(settings_path).st_mtime
+        except OSError:
+            mtime = None
+        if (settings_path, mtime) == self._settings_key:
+            return
+        self._settings_key = (settings_path, mtime)
+        settings = {}
+        if mtime is not None:
+            try:
+                with open(self.settings_path) as f:
+                    settings = json.load(f)
+            except (OSError, ValueError):
+                pass
+        self.enabled = bool(settings.get('enabled', False))
+        self.sample_rate = float(settings.get('sample_rate', 0.0))
+        self.endpoint = settings.get('endpoint') or None
+
+    def save_settings(self, enabled, sample_rate, endpoint=None):
+        os.makedirs(os.path.dirname(self.settings_path), exist_ok=True)
+        tmp_path = f'{self.settings_path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'enabled': enabled, 'sample_rate': sample_rate, 'endpoint': endpoint or None}, f)
+        os.replace(tmp_path, self.settings_path)
+        self._settings_key = None
+        self.reload()
+
+    def _before_request(self):
+        now = time.monotonic()
+        if now >= self._next_check:
+            self._next_check = now + self.reload_seconds
+            self.reload()
+        if not self.enabled:
+            return
+        if self.endpoint and request.endpoint != self.endpoint:
+            return
+        if random.random() >= self.sample_rate:
+            return
+        sampler = StackSampler(threading.get_ident(), self.interval)
+        sampler.start()
+        g._profiler_sampler = sampler
+
+    def _teardown_request(self, exc):
+        sampler = g.pop('_profiler_sampler', None)
+        if sampler is None:
+            return
+        stacks = sampler.stop()
+        if not stacks:
+            return
+        # A failed write (full disk, read-only instance/) must never reach the response
+        try:
+            self._write_profile(request.endpoint or 'unknown', sampler.duration, stacks)
+        except OSError:
+            current_app.logger.exception('Could not save profile to %s', self.profiles_dir)
+
+    def _write_profile(self, endpoint, duration, stacks):
+        os.makedirs(self.profiles_dir, exist_ok=True)
+        filename = '{}_{}_{}ms_{}.collapsed'.format(
+            datetime.utcnow().strftime('%Y%m%d-%H%M%S'),
+            re.sub(r'[^\w.]', '_', endpoint),
+            int(duration * 1000),
+            uuid.uuid4().hex[:6]
+        )
+        with open(os.path.join(self.profiles_dir, filename), 'w') as f:
+            for stack, count in stacks.items():
+                f.write(f'{stack} {count}\n')
+
+        for old in self.list_profiles()[self.max_profiles:]:
+            try:
+                os.remove(os.path.join(self.profiles_dir, old['filename']))
+            except OSError:
+                pass
+
+    def list_profiles(self):
+        """Return saved profiles, newest first"""
+        try:
+            names = os.listdir(self.profiles_dir)
+        except OSError:
+            return []
+        profiles = []
+        for name in names:
+            match = PROFILE_NAME_RE.match(name)
+            if not match:
+                continue
+            try:
+                size = os.path.getsize(os.path.join(self.profiles_dir, name))
+            except OSError:
+                # Pruned by another worker since listdir
+                continue
+            profiles.append({
+                'filename': name,
+                'created_at': datetime.strptime(match.group(1), '%Y%m%d-%H%M%S'),
+                'endpoint': match.group(2),
+                'duration_ms': int(match.group(3)),
+                'size': size,
+            })
+        profiles.sort(key=lambda p: p['filename'], reverse=True)
+        return profiles
@@ -0,0 +1,157 @@
+import calendar
+import click
+from datetime import datetime, timedelta
+from flask import current_app
+from flask.cli import AppGroup
+from app import db
+from app.models import CartItem, Order, OrderItem, ArchivedOrder, ArchivedOrderItem
+
+retention_cli = AppGroup('retention', help='Purge abandoned carts and archive old orders.')
+
+ORDER_COLUMNS = ['id', 'order_number', 'total_amount', 'status', 'shipping_address',
+                 'billing_address', 'payment_method', 'payment_status', 'created_at',
+                 'updated_at', 'user_id']
+ORDER_ITEM_COLUMNS = ['id', 'quantity', 'price', 'order_id', 'product_id']
+
+def ensure_indexes():
+    """Create the retention indexes on databases that predate them.
+
+    `db.create_all()` only creates missing tables, so existing `orders` and
+    `cart_items` tables would otherwise never get them.
+    """
+    for table in (Order.__table__, CartItem.__table__):
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
+
+def months_ago(months, now=None):
+    """Return the datetime `months` calendar months before `now`"""
+    now = now or datetime.utcnow()
+    year, month = divmod(now.year * 12 + now.month - 1 - months, 12)
+    month += 1
+    # Clamp the day for shorter months (e.g. Mar 31 -> Feb 28)
+    day = min(now.day, calendar.monthrange(year, month)[1])
+    return now.replace(year=year, month=month, day=day)
+
+def purge_abandoned_carts(max_age_days=None):
+    """Delete carts untouched for more than `max_age_days`, return the number
+    of cart items removed. A cart counts as touched while any of its items
+    is newer than the cutoff, so active carts keep their older items."""
+    if max_age_days is None:
+        max_age_days = current_app.config['CART_RETENTION_DAYS']
+    cutoff = datetime.utcnow() - timedelta(days=max_age_days)
+
+    abandoned_users = (
+        db.select(CartItem.user_id)
+        .group_by(CartItem.user_id)
+        .having(db.func.max(CartItem.added_at) < cutoff)
+    )
+    deleted = CartItem.query.filter(CartItem.user_id.in_(abandoned_users)).delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
+
+def archive_orders(months=None, batch_size=None, max_batches=None):
+    """Move orders older than `months` into the archive tables.
+
+    Each batch is copied and deleted in its own transaction, so an interrupted
+    run can simply be started again and picks up where it stopped.
+    The newest order is never archived: without AUTOINCREMENT, SQLite hands
+    out max(id) + 1, so removing it would let a new order reuse an archived id.
+    Raises RuntimeError if an order or order item id already exists in the
+    archive.
+    Returns the number of orders archived.
+    """
+    if months is None:
+        months = current_app.config['ORDER_ARCHIVE_MONTHS']
+    if batch_size is None:
+        batch_size = current_app.config['ARCHIVE_BATCH_SIZE']
+    cutoff = months_ago(months)
+
+    orders_table = Order.__table__
+    items_table = OrderItem.__table__
+    archived_orders_table = ArchivedOrder.__table__
+    archived_items_table = ArchivedOrderItem.__table__
+
+    archived = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        order_ids = db.session.execute(
+            db.select(orders_table.c.id)
+            .where(orders_table.c.created_at < cutoff)
+            .where(orders_table.c.id < db.select(db.func.max(orders_table.c.id)).scalar_subquery())
+            .order_by(orders_table.c.id)
+            .limit(batch_size)
+        ).scalars().all()
+        if not order_ids:
+            break
+
+        duplicates = db.session.execute(
+            db.select(archived_orders_table.c.id).where(archived_orders_table.c.id.in_(order_ids))
+        ).scalars().all()
+        if duplicates:
+            raise RuntimeError(
+                f'Order id(s) {", ".join(map(str, duplicates))} already exist in archived_orders; '
+                'resolve the conflict by hand before archiving again.'
+            )
+        # order_items ids can be reused too on SQLite tables created without AUTOINCREMENT
+        duplicate_items = db.session.execute(
+            db.select(archived_items_table.c.id).where(archived_items_table.c.id.in_(
+                db.select(items_table.c.id).where(items_table.c.order_id.in_(order_ids))
+            ))
+        ).scalars().all()
+        if duplicate_items:
+            raise RuntimeError(
+                f'Order item id(s) {", ".join(map(str, duplicate_items))} already exist in archived_order_items; '
+                'resolve the conflict by hand before archiving again.'
+            )
+
+        try:
+            db.session.execute(archived_orders_table.insert().from_select(
+                ORDER_COLUMNS,
+                db.select(*[orders_table.c[name] for name in ORDER_COLUMNS])
+                .where(orders_table.c.id.in_(order_ids))
+            ))
+            db.session.execute(archived_items_table.insert().from_select(
+                ORDER_ITEM_COLUMNS,
+                db.select(*[items_table.c[name] for name in ORDER_ITEM_COLUMNS])
+                .where(items_table.c.order_id.in_(order_ids))
+            ))
+            db.session.execute(items_table.delete().where(items_table.c.order_id.in_(order_ids)))
+            db.session.execute(orders_table.delete().where(orders_table.c.id.in_(order_ids)))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        archived += len(order_ids)
+        batches += 1
+
+    return archived
+
+@retention_cli.command('purge-carts')
+@click.option('--days', type=int, default=None, help='Cart age in days (default: CART_RETENTION_DAYS).')
+def purge_carts_command(days):
+    """Delete abandoned cart items."""
+    deleted = purge_abandoned_carts(days)
+    click.echo(f'Purged {deleted} abandoned cart item(s).')
+
+@retention_cli.command('archive-orders')
+@click.option('--months', type=int, default=None, help='Order age in months (default: ORDER_ARCHIVE_MONTHS).')
+@click.option('--batch-size', type=int, default=None, help='Orders per transaction (default: ARCHIVE_BATCH_SIZE).')
+@click.option('--max-batches', type=int, default=None, help='Stop after this many batches.')
+def archive_orders_command(months, batch_size, max_batches):
+    """Move old orders into the archive tables."""
+    try:
+        archived = archive_orders(months, batch_size, max_batches)
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    click.echo(f'Archived {archived} order(s).')
+
+@retention_cli.command('run')
+def run_command():
+    """Run every retention task with configured defaults (for schedulers)."""
+    deleted = purge_abandoned_carts()
+    try:
+        archived = archive_orders()
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    click.echo(f'Purged {deleted} abandoned cart item(s), archived {archived} order(s).')
@@ -1,10 +1,12 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, abort
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, abort, send_from_directory
 from flask_login import login_user, logout_user, current_user, login_required
 from sqlalchemy import or_, desc
-from app import db
-from app.models import User, Product, Category, CartItem, Order, OrderItem, Review
-from app.forms import RegistrationForm, LoginForm, ProductForm, ReviewForm, CheckoutForm
+from app import db, profiler
+from app.models import User, Product, Category, CartItem, Order, OrderItem, ArchivedOrder, Review
+from app.forms import RegistrationForm, LoginForm, ProductForm, ReviewForm, CheckoutForm, ProfilerForm
 from app.utils import save_image, admin_required
+from app.feeds import feeds_dir
+from datetime import datetime
 import os
 
 # Create blueprints
@@ -98,6 +100,22 @@ def product_detail(product_id):
                          avg_rating=round(avg_rating, 1),
                          form=form) 
 
+@main.route('/sitemap.xml')
+def sitemap_index():
+    return send_from_directory(feeds_dir(), 'sitemap.xml', mimetype='application/xml')
+
+@main.route('/sitemaps/<filename>')
+def sitemap_file(filename):
+    if not filename.startswith('sitemap-') or not filename.endswith('.xml.gz'):
+        abort(404)
+    return send_from_directory(feeds_dir(), filename, mimetype='application/gzip')
+
+@main.route('/feeds/<filename>')
+def product_feed(filename):
+    if filename not in ('products.xml.gz', 'products.csv.gz'):
+        abort(404)
+    return send_from_directory(feeds_dir(), filename, mimetype='application/gzip')
+
 @auth.route('/register', methods=['GET', 'POST'])
 def register():
     if current_user.is_authenticated:
@@ -173,6 +191,7 @@ def add_to_cart(product_id):
     
     if cart_item:
         cart_item.quantity += quantity
+        cart_item.added_at = datetime.utcnow()
     else:
         cart_item = CartItem(
             user_id=current_user.id,
@@ -205,6 +224,7 @@ def update_cart(item_id):
         if quantity > cart_item.product.stock_quantity:
             return jsonify({'success': False, 'message': 'Not enough stock available'})
         cart_item.quantity = quantity
+        cart_item.added_at = datetime.utcnow()
     
     db.session.commit()
     
@@ -278,12 +298,14 @@ def checkout():
 @login_required
 def order_history():
     orders = Order.query.filter_by(user_id=current_user.id).order_by(desc(Order.created_at)).all()
+    # Archived orders are always older than the ones still in `orders`
+    orders += ArchivedOrder.query.filter_by(user_id=current_user.id).order_by(desc(ArchivedOrder.created_at)).all()
     return render_template('orders/history.html', orders=orders)
 
 @orders.route('/orders/<int:order_id>')
 @login_required
 def order_detail(order_id):
-    order = Order.query.get_or_404(order_id)
+    order = Order.query.get(order_id) or ArchivedOrder.query.get_or_404(order_id)
     
     if order.user_id != current_user.id and not current_user.is_admin:
         abort(403)
@@ -373,6 +395,30 @@ def admin_users():
     
     return render_template('admin/users.html', users=users)
 
+@admin.route('/admin/profiles', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def admin_profiles():
+    form = ProfilerForm()
+    
+    if form.validate_on_submit():
+        profiler.save_settings(form.enabled.data, form.sample_rate.data, form.endpoint.data)
+        flash('Profiler settings saved', 'success')
+        return redirect(url_for('admin.admin_profiles'))
+    
+    if request.method == 'GET':
+        form.enabled.data = profiler.enabled
+        form.sample_rate.data = profiler.sample_rate
+        form.endpoint.data = profiler.endpoint
+    
+    return render_template('admin/profiles.html', form=form, profiles=profiler.list_profiles())
+
+@admin.route('/admin/profiles/<filename>')
+@login_required
+@admin_required
+def admin_download_profile(filename):
+    return send_from_directory(profiler.profiles_dir, filename, as_attachment=True)
+
 @products.route('/product/<int:product_id>/review', methods=['POST'])
 @login_required
 def add_review(product_id):
@@ -16,4 +16,19 @@ class Config:
     
     PRODUCTS_PER_PAGE = 12
     
+    # Retention (see `flask retention --help`)
+    CART_RETENTION_DAYS = int(os.environ.get('CART_RETENTION_DAYS', 30))
+    ORDER_ARCHIVE_MONTHS = int(os.environ.get('ORDER_ARCHIVE_MONTHS', 12))
+    ARCHIVE_BATCH_SIZE = int(os.environ.get('ARCHIVE_BATCH_SIZE', 500))
+    
+    # Sitemap and product feeds (see `flask feeds --help`)
+    FEED_BASE_URL = os.environ.get('FEED_BASE_URL', 'http://localhost:5000')
+    FEED_CHUNK_SIZE = 1000
+    FEED_SHARD_SIZE = 50000
+    
+    # Sampling profiler, switched on from /admin/profiles
+    PROFILER_INTERVAL = 0.005
+    PROFILER_MAX_PROFILES = 50
+    PROFILER_RELOAD_SECONDS = 5
+    
     ADMIN_USERS = ['admin@tshirtstore.com']
\ No newline at end of file
@@ -0,0 +1,42 @@
+from datetime import datetime
+import pytest
+from config import Config
+from app import create_app, db
+from app.models import Order, OrderItem
+
+@pytest.fixture
+def app(tmp_path):
+    class TestConfig(Config):
+        TESTING = True
+        WTF_CSRF_ENABLED = False
+        PROFILER_RELOAD_SECONDS = 0
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'test.db'}"
+    
+    app = create_app(TestConfig)
+    app.instance_path = str(tmp_path / 'instance')
+    
+    with app.app_context():
+        yield app
+        db.session.remove()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def admin_client(client):
+    client.post('/login', data={'email': 'admin@tshirtstore.com', 'password': 'admin123'})
+    return client
+
+@pytest.fixture
+def make_order(app):
+    """Factory for a committed order with one item"""
+    def make_order(user, created_at=None):
+        order = Order(user_id=user.id, total_amount=10, created_at=created_at or datetime.utcnow())
+        order.generate_order_number()
+        db.session.add(order)
+        db.session.flush()
+        db.session.add(OrderItem(order_id=order.id, product_id=1, quantity=1, price=10))
+        db.session.commit()
+        return order
+    return make_order
@@ -0,0 +1,128 @@
+import csv
+import gzip
+import io
+import os
+import pytest
+from app import db
+from app.models import Product
+from app.feeds import generate_feeds, feeds_dir
+
+# Seeded products 1-5 with a shard size of 2: shard 0 = {1}, 1 = {2, 3}, 2 = {4, 5}
+
+@pytest.fixture
+def feeds(app):
+    app.config['FEED_SHARD_SIZE'] = 2
+    generate_feeds()
+    return feeds_dir()
+
+def feed_ids(directory):
+    with gzip.open(os.path.join(directory, 'products.csv.gz'), 'rt', encoding='utf-8') as f:
+        return [int(row['id']) for row in csv.DictReader(io.StringIO(f.read()))]
+
+def xml_feed(directory):
+    with gzip.open(os.path.join(directory, 'products.xml.gz'), 'rt', encoding='utf-8') as f:
+        return f.read()
+
+def sitemap_index(directory):
+    with open(os.path.join(directory, 'sitemap.xml'), encoding='utf-8') as f:
+        return f.read()
+
+def shard_mtimes(directory, shard):
+    return [os.stat(os.path.join(directory, name)).st_mtime_ns for name in (
+        f'sitemap-products-{shard}.xml.gz',
+        f'parts/products-{shard}.xml.gz',
+        f'parts/products-{shard}.csv.gz',
+    )]
+
+def test_sale_price_only_for_discounted_products(feeds):
+    with gzip.open(os.path.join(feeds, 'products.csv.gz'), 'rt', encoding='utf-8') as f:
+        rows = {int(row['id']): row for row in csv.DictReader(io.StringIO(f.read()))}
+    
+    assert rows[1]['price'] == '19.99 USD' and rows[1]['sale_price'] == ''
+    assert rows[2]['price'] == '24.99 USD' and rows[2]['sale_price'] == '19.99 USD'
+    assert rows[1]['stock_quantity'] == '50'
+    
+    xml = xml_feed(feeds)
+    assert xml.count('<g:sale_price>') == 1
+    assert '<g:sale_price>19.99 USD</g:sale_price>' in xml
+    assert 'stock_quantity' not in xml
+
+def test_deactivating_product_rewrites_only_its_shard(feeds):
+    assert feed_ids(feeds) == [1, 2, 3, 4, 5]
+    
+    db.session.get(Product, 3).is_active = False
+    db.session.commit()
+    
+    assert generate_feeds() == [1]
+    assert feed_ids(feeds) == [1, 2, 4, 5]
+    assert '/product/3<' not in xml_feed(feeds)
+    with gzip.open(os.path.join(feeds, 'sitemap-products-1.xml.gz'), 'rt', encoding='utf-8') as f:
+        assert '/product/3<' not in f.read()
+
+def test_unchanged_shards_are_not_rewritten(feeds):
+    before = {shard: shard_mtimes(feeds, shard) for shard in (0, 1, 2)}
+    
+    db.session.get(Product, 2).stock_quantity = 7
+    db.session.commit()
+    
+    assert generate_feeds() == [1]
+    assert shard_mtimes(feeds, 0) == before[0]
+    assert shard_mtimes(feeds, 2) == before[2]
+    assert shard_mtimes(feeds, 1) != before[1]
+    
+    after = {shard: shard_mtimes(feeds, shard) for shard in (0, 1, 2)}
+    assert generate_feeds() == []
+    assert {shard: shard_mtimes(feeds, shard) for shard in (0, 1, 2)} == after
+
+def test_empty_shard_is_removed_from_sitemap(feeds):
+    assert 'sitemap-products-2.xml.gz' in sitemap_index(feeds)
+    
+    db.session.get(Product, 4).is_active = False
+    db.session.get(Product, 5).is_active = False
+    db.session.commit()
+    
+    assert generate_feeds() == [2]
+    assert 'sitemap-products-2.xml.gz' not in sitemap_index(feeds)
+    assert not os.path.exists(os.path.join(feeds, 'sitemap-products-2.xml.gz'))
+    assert not os.path.exists(os.path.join(feeds, 'parts', 'products-2.csv.gz'))
+    assert feed_ids(feeds) == [1, 2, 3]
+
+def test_full_rebuild_removes_stale_shards(app, feeds):
+    # Hard deletes leave updated_at untouched, so only --full notices them
+    db.session.delete(db.session.get(Product, 1))
+    db.session.commit()
+    
+    assert generate_feeds() == []
+    assert feed_ids(feeds) == [1, 2, 3, 4, 5]
+    
+    result = app.test_cli_runner().invoke(args=['feeds', 'generate', '--full'])
+    
+    assert result.exit_code == 0
+    assert feed_ids(feeds) == [2, 3, 4, 5]
+    assert 'sitemap-products-0.xml.gz' not in sitemap_index(feeds)
+    assert not os.path.exists(os.path.join(feeds, 'sitemap-products-0.xml.gz'))
+
+def test_corrupt_state_triggers_full_rebuild(feeds):
+    with open(os.path.join(feeds, 'state.json'), 'w') as f:
+        f.write('{"last_run": "20')
+    
+    assert generate_feeds() == [0, 1, 2]
+    assert feed_ids(feeds) == [1, 2, 3, 4, 5]
+
+def test_format_change_triggers_full_rebuild(feeds):
+    with open(os.path.join(feeds, 'state.json'), 'w') as f:
+        f.write('{"last_run": "2020-01-01T00:00:00", "shard_size": 2}')
+    
+    assert generate_feeds() == [0, 1, 2]
+
+def test_tmp_leftovers_are_removed_without_full_rebuild(feeds):
+    leftovers = [os.path.join(feeds, 'parts', 'products-1.csv.gz.tmp'),
+                 os.path.join(feeds, 'sitemap-products-7.xml.gz.tmp'),
+                 os.path.join(feeds, 'state.json.tmp')]
+    for path in leftovers:
+        with open(path, 'w') as f:
+            f.write('partial')
+    
+    assert generate_feeds() == []
+    assert not any(os.path.exists(path) for path in leftovers)
+    assert 'sitemap-products-7' not in sitemap_index(feeds)
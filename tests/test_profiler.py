@@ -0,0 +1,106 @@
+import os
+import time
+import pytest
+from app import db, profiler
+from app.models import User
+
+@pytest.fixture
+def profiled(app, monkeypatch):
+    """Make main.products_list slow enough to always collect samples"""
+    view = app.view_functions['main.products_list']
+    
+    def slow_products_list(*args, **kwargs):
+        time.sleep(0.02)
+        return view(*args, **kwargs)
+    
+    monkeypatch.setitem(app.view_functions, 'main.products_list', slow_products_list)
+    monkeypatch.setattr(profiler, 'interval', 0.001)
+    return app
+
+def profile_files(app):
+    directory = os.path.join(app.instance_path, 'profiles')
+    if not os.path.isdir(directory):
+        return []
+    return sorted(os.listdir(directory))
+
+def test_admin_form_enables_profiling(profiled, admin_client):
+    response = admin_client.post('/admin/profiles', data={
+        'enabled': 'y', 'sample_rate': '1', 'endpoint': 'main.products_list'
+    })
+    assert response.status_code == 302
+    
+    assert admin_client.get('/products').status_code == 200
+    
+    files = profile_files(profiled)
+    assert len(files) == 1
+    assert files[0].endswith('.collapsed') and '_main.products_list_' in files[0]
+    with open(os.path.join(profiled.instance_path, 'profiles', files[0])) as f:
+        stack, count = f.readline().rsplit(' ', 1)
+    assert 'slow_products_list' in stack and int(count) > 0
+    
+    page = admin_client.get('/admin/profiles')
+    assert files[0].encode() in page.data
+    download = admin_client.get(f'/admin/profiles/{files[0]}')
+    assert download.status_code == 200
+    assert b'slow_products_list' in download.data
+
+def test_nothing_written_when_disabled(profiled, client):
+    profiler.save_settings(False, 1.0, 'main.products_list')
+    
+    client.get('/products')
+    
+    assert profile_files(profiled) == []
+
+def test_nothing_written_for_other_endpoints(profiled, client):
+    profiler.save_settings(True, 1.0, 'orders.checkout')
+    
+    client.get('/products')
+    
+    assert profile_files(profiled) == []
+
+def test_sample_rate_gates_requests(profiled, client, monkeypatch):
+    monkeypatch.setattr('random.random', lambda: 0.5)
+    
+    profiler.save_settings(True, 0.4)
+    client.get('/products')
+    assert profile_files(profiled) == []
+    
+    profiler.save_settings(True, 0.6)
+    client.get('/products')
+    assert len(profile_files(profiled)) == 1
+
+def test_profiles_are_pruned(profiled, client, monkeypatch):
+    monkeypatch.setattr(profiler, 'max_profiles', 2)
+    profiler.save_settings(True, 1.0, 'main.products_list')
+    
+    for _ in range(4):
+        client.get('/products')
+    
+    assert len(profile_files(profiled)) == 2
+
+def test_unknown_endpoint_is_rejected(app, admin_client):
+    response = admin_client.post('/admin/profiles', data={
+        'enabled': 'y', 'sample_rate': '1', 'endpoint': 'main.nope'
+    })
+    
+    assert response.status_code == 200
+    assert b'Unknown endpoint' in response.data
+    assert not os.path.exists(os.path.join(app.instance_path, 'profiler.json'))
+
+def test_profiles_pages_are_admin_only(app, client):
+    user = User(username='shopper', email='shopper@example.com')
+    user.set_password('secret123')
+    db.session.add(user)
+    db.session.commit()
+    
+    for url in ('/admin/profiles', '/admin/profiles/any.collapsed'):
+        assert '/login' in client.get(url).headers['Location']
+    
+    client.post('/login', data={'email': 'shopper@example.com', 'password': 'secret123'})
+    for url in ('/admin/profiles', '/admin/profiles/any.collapsed'):
+        response = client.get(url)
+        assert response.status_code == 302
+        assert '/admin' not in response.headers['Location']
+    response = client.post('/admin/profiles', data={'enabled': 'y', 'sample_rate': '1'})
+    assert response.status_code == 302
+    assert not os.path.exists(os.path.join(app.instance_path, 'profiler.json'))
@@ -0,0 +1,92 @@
+from datetime import datetime, timedelta
+import pytest
+from app import db
+from app.models import User, CartItem, Order, OrderItem, ArchivedOrder, ArchivedOrderItem
+from app.retention import months_ago, archive_orders, purge_abandoned_carts
+
+def test_months_ago_clamps_day():
+    assert months_ago(1, datetime(2023, 3, 31)) == datetime(2023, 2, 28)
+    assert months_ago(1, datetime(2024, 3, 31)) == datetime(2024, 2, 29)
+    assert months_ago(12, datetime(2024, 2, 29)) == datetime(2023, 2, 28)
+    assert months_ago(3, datetime(2024, 1, 15, 8, 30)) == datetime(2023, 10, 15, 8, 30)
+
+def test_archive_orders_resumes_in_batches(app, make_order):
+    user = User.query.first()
+    old = datetime.utcnow() - timedelta(days=800)
+    old_ids = [make_order(user, old).id for _ in range(5)]
+    recent = make_order(user)
+    
+    assert archive_orders(months=12, batch_size=2, max_batches=1) == 2
+    assert sorted(o.id for o in ArchivedOrder.query) == old_ids[:2]
+    assert Order.query.count() == 4
+    
+    assert archive_orders(months=12, batch_size=2) == 3
+    assert sorted(o.id for o in ArchivedOrder.query) == old_ids
+    assert ArchivedOrderItem.query.count() == 5
+    assert [o.id for o in Order.query] == [recent.id]
+    assert OrderItem.query.count() == 1
+
+def test_archive_orders_keeps_newest_order(app, make_order):
+    user = User.query.first()
+    old = datetime.utcnow() - timedelta(days=800)
+    orders = [make_order(user, old) for _ in range(3)]
+    
+    assert archive_orders(months=12) == 2
+    assert [o.id for o in Order.query] == [orders[-1].id]
+
+def test_archive_orders_rejects_archived_ids(app, make_order):
+    user = User.query.first()
+    old = datetime.utcnow() - timedelta(days=800)
+    order = make_order(user, old)
+    make_order(user)
+    db.session.add(ArchivedOrder(id=order.id, order_number='ORD-CLASH'))
+    db.session.commit()
+    
+    with pytest.raises(RuntimeError, match='already exist in archived_orders'):
+        archive_orders(months=12)
+    assert db.session.get(Order, order.id) is not None
+
+def make_user(username):
+    user = User(username=username, email=f'{username}@example.com')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+def test_archive_orders_rejects_archived_item_ids(app, make_order):
+    user = User.query.first()
+    old = datetime.utcnow() - timedelta(days=800)
+    order = make_order(user, old)
+    make_order(user)
+    item = order.order_items.first()
+    db.session.add(ArchivedOrderItem(id=item.id, order_id=None, quantity=1, price=1))
+    db.session.commit()
+    
+    with pytest.raises(RuntimeError, match=f'Order item id\\(s\\) {item.id} already exist'):
+        archive_orders(months=12)
+    assert db.session.get(Order, order.id) is not None
+    assert ArchivedOrder.query.count() == 0
+
+def test_purge_abandoned_carts_respects_cutoff(app):
+    stale, recent = make_user('stale'), make_user('recent')
+    now = datetime.utcnow()
+    db.session.add_all([
+        CartItem(user_id=stale.id, product_id=1, added_at=now - timedelta(days=40)),
+        CartItem(user_id=stale.id, product_id=2, added_at=now - timedelta(days=31)),
+        CartItem(user_id=recent.id, product_id=3, added_at=now - timedelta(days=29)),
+    ])
+    db.session.commit()
+    
+    assert purge_abandoned_carts(30) == 2
+    assert [item.product_id for item in CartItem.query] == [3]
+
+def test_purge_abandoned_carts_keeps_active_carts_whole(app):
+    user = make_user('shopper')
+    now = datetime.utcnow()
+    db.session.add_all([
+        CartItem(user_id=user.id, product_id=1, added_at=now - timedelta(days=31)),
+        CartItem(user_id=user.id, product_id=2, added_at=now),
+    ])
+    db.session.commit()
+    
+    assert purge_abandoned_carts(30) == 0
+    assert sorted(item.product_id for item in CartItem.query) == [1, 2]
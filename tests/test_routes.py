@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta
+from app import db
+from app.models import User, CartItem, ArchivedOrder
+from app.retention import archive_orders
+from app.feeds import generate_feeds
+
+def test_update_cart_refreshes_added_at(admin_client):
+    user = User.query.filter_by(email='admin@tshirtstore.com').first()
+    stale = datetime.utcnow() - timedelta(days=60)
+    item = CartItem(user_id=user.id, product_id=1, quantity=1, added_at=stale)
+    db.session.add(item)
+    db.session.commit()
+    
+    response = admin_client.post(f'/cart/update/{item.id}', data={'quantity': 2})
+    
+    assert response.get_json()['success']
+    db.session.refresh(item)
+    assert item.quantity == 2
+    assert item.added_at > stale + timedelta(days=59)
+
+def test_orders_read_archived_orders(admin_client, make_order):
+    user = User.query.filter_by(email='admin@tshirtstore.com').first()
+    archived = make_order(user, datetime.utcnow() - timedelta(days=800))
+    current = make_order(user)
+    archived_id, archived_number = archived.id, archived.order_number
+    
+    assert archive_orders(months=12) == 1
+    assert db.session.get(ArchivedOrder, archived_id) is not None
+    
+    history = admin_client.get('/orders')
+    assert history.status_code == 200
+    assert archived_number.encode() in history.data
+    assert current.order_number.encode() in history.data
+    
+    detail = admin_client.get(f'/orders/{archived_id}')
+    assert detail.status_code == 200
+    assert archived_number.encode() in detail.data
+
+def test_sitemap_file_rejects_other_files(app, client):
+    app.config['FEED_SHARD_SIZE'] = 2
+    generate_feeds()
+    
+    assert client.get('/sitemap.xml').status_code == 200
+    assert client.get('/sitemaps/sitemap-products-0.xml.gz').status_code == 200
+    for filename in ('state.json', 'products.csv.gz', 'sitemap.xml', 'sitemap-products-0.xml.gz.tmp'):
+        assert client.get(f'/sitemaps/{filename}').status_code == 404
+    assert client.get('/sitemaps/..%2Fstate.json').status_code == 404